@@ -1,6 +1,4 @@
 import streamlit as st
-import plotly.graph_objects as go
-import pandas as pd  # <--- Added this to handle tables
 import psi_backend as backend
 
 # --- PAGE CONFIGURATION ---
@@ -13,7 +11,9 @@ st.markdown("### Developed by **Sivamanikanta Kumar**")
 st.markdown("Geotechnical Engineer")
 
 # --- SIDEBAR INPUTS ---
-with st.sidebar:
+# Inputs sit in a form so edits are batched: the script only reruns (and the
+# analysis below only sees new values) when "Run Analysis" is pressed
+with st.sidebar.form("psi_inputs"):
     st.header("1. Pipeline Geometry")
     Dop = st.number_input("Outer Diameter (m)", value=0.3239, format="%.4f")
     tp = st.number_input("Wall Thickness (m)", value=0.0127, format="%.4f")
@@ -43,24 +43,29 @@ with st.sidebar:
         p95_ssr = c1.number_input(f"{surface_name} P95 SSR", value=0.45)
         p95_prem = c2.number_input(f"{surface_name} P95 Prem", value=1.0)
         
-        return {
-            f"{surface_name}_P5_SSR": p5_ssr, f"{surface_name}_P5_Prem": p5_prem,
-            f"{surface_name}_P50_SSR": p50_ssr, f"{surface_name}_P50_Prem": p50_prem,
-            f"{surface_name}_P95_SSR": p95_ssr, f"{surface_name}_P95_Prem": p95_prem,
-        }
+        # Frozen as ((SSR P5, P50, P95), (Prem P5, P50, P95)) so the cache key
+        # hashes as a few floats rather than nested dicts/lists
+        return ((p5_ssr, p50_ssr, p95_ssr), (p5_prem, p50_prem, p95_prem))
         
-    conc_data = get_surface_params("Concrete")
-    pet_data = get_surface_params("PET")
+    coeffs_conc = get_surface_params("Concrete")
+    coeffs_pet = get_surface_params("PET")
+    
+    st.form_submit_button("Run Analysis", type="primary")
 
 # --- EXECUTE CALCULATION ---
 inputs = {
     'Dop': Dop, 'tp': tp, 'Z': Z, 'Su': Su, 'OCR': OCR, 'St': St,
-    'alpha': alpha, 'rate': rate, 'gamma_bulk': gamma_bulk, 'Su_passive': Su_passive
+    'alpha': alpha, 'rate': rate, 'gamma_bulk': gamma_bulk, 'Su_passive': Su_passive,
+    'Concrete': coeffs_conc, 'PET': coeffs_pet
 }
-inputs.update(conc_data)
-inputs.update(pet_data)
 
-results = backend.run_psi_analysis(inputs)
+# Streamlit reruns the script on every widget change, so cache the analysis on
+# the input values. A sorted tuple of items is cheap for the hasher to key on.
+@st.cache_data(show_spinner=False)
+def run_analysis(input_items):
+    return backend.run_psi_analysis(dict(input_items))
+
+results = run_analysis(tuple(sorted(inputs.items())))
 metrics = results["metrics"]
 
 # --- RESULTS DASHBOARD ---
@@ -81,33 +86,34 @@ else:
 st.markdown("---")
 st.subheader("Detailed Resistance Values")
 
-# Convert the results list into a Pandas DataFrame for display
-table_data = []
-for p in results["profiles"]:
-    table_data.append({
-        "Surface": p["Surface"],
-        "Estimate": p["Estimate"],
-        "Axial Brk (kN/m)": p["Axial"]["BreakForce"],
-        "Xbrk (mm)": p["Axial"]["BreakDisp"],
-        "Axial Res (kN/m)": p["Axial"]["ResForce"],
-        "Xres (mm)": p["Axial"]["ResDisp"],
-        "Lat Brk (kN/m)": p["Lateral"]["BreakForce"],
-        "Ybrk (mm)": p["Lateral"]["BreakDisp"],
-        "Lat Res (kN/m)": p["Lateral"]["ResForce"],
-        "Yres (mm)": p["Lateral"]["ResDisp"]
-    })
-
-df_results = pd.DataFrame(table_data)
+# Result columns, already split per surface by the backend
+surface_groups = results["surfaces"]
+TABLE_COLUMNS = {
+    "Estimate": "estimate",
+    "Axial Brk (kN/m)": "ax_brkF",
+    "Xbrk (mm)": "ax_brkD",
+    "Axial Res (kN/m)": "ax_resF",
+    "Xres (mm)": "ax_resD",
+    "Lat Brk (kN/m)": "lat_brkF",
+    "Ybrk (mm)": "lat_brkD",
+    "Lat Res (kN/m)": "lat_resF",
+    "Yres (mm)": "lat_resD",
+}
+
+# Plain dict of lists: a 3-row table does not need a DataFrame
+def surface_table(surface_name):
+    group = surface_groups[surface_name]
+    return {label: group[key].tolist() for label, key in TABLE_COLUMNS.items()}
 
 # Show two separate tables for clarity
 c1, c2 = st.columns(2)
 with c1:
     st.markdown("**Concrete Surface Values**")
-    st.dataframe(df_results[df_results["Surface"] == "Concrete"].drop(columns=["Surface"]), use_container_width=True)
+    st.table(surface_table("Concrete"))
 
 with c2:
     st.markdown("**PET Surface Values**")
-    st.dataframe(df_results[df_results["Surface"] == "PET"].drop(columns=["Surface"]), use_container_width=True)
+    st.table(surface_table("PET"))
 
 
 # --- PLOTTING SECTION ---
@@ -115,30 +121,34 @@ st.markdown("---")
 st.subheader("Resistance Profiles (Graphs)")
 
 def plot_surface_graphs(surface_name):
+    # Deferred so plotly is only loaded when figures are actually built
+    import plotly.graph_objects as go
+    
     fig_ax = go.Figure()
     fig_lat = go.Figure()
     
     colors = {"P5": "green", "P50": "blue", "P95": "red"}
     
-    subset = [r for r in results["profiles"] if r["Surface"] == surface_name]
+    group = surface_groups[surface_name]
     
-    for res in subset:
-        est = res["Estimate"]
+    for est, xb, xr, fb, fr, yb, yr, lb, lr in zip(
+        group["estimate"].tolist(),
+        group["ax_brkD"], group["ax_resD"], group["ax_brkF"], group["ax_resF"],
+        group["lat_brkD"], group["lat_resD"], group["lat_brkF"], group["lat_resF"],
+    ):
         color = colors.get(est, "black")
         
         # Plot Axial
-        ax = res["Axial"]
         fig_ax.add_trace(go.Scatter(
-            x=[0, ax["BreakDisp"], ax["ResDisp"], ax["ResDisp"]*1.5],
-            y=[0, ax["BreakForce"], ax["ResForce"], ax["ResForce"]],
+            x=[0, xb, xr, xr*1.5],
+            y=[0, fb, fr, fr],
             mode='lines+markers', name=est, line=dict(color=color)
         ))
         
         # Plot Lateral
-        lat = res["Lateral"]
         fig_lat.add_trace(go.Scatter(
-            x=[0, lat["BreakDisp"], lat["ResDisp"], lat["ResDisp"]*1.5],
-            y=[0, lat["BreakForce"], lat["ResForce"], lat["ResForce"]],
+            x=[0, yb, yr, yr*1.5],
+            y=[0, lb, lr, lr],
             mode='lines+markers', name=est, line=dict(color=color)
         ))
     
@@ -1,53 +1,85 @@
+import hashlib
+
 import numpy as np
 
-def run_psi_analysis(inputs):
+PI = 3.141592653589793
+
+# --- PIPE WEIGHT CONSTANTS ---
+# Densities: 7850 (Steel), 1000 (Fluid), 1025 (Seawater), folded with pi/4
+_K_STEEL = PI * 7850 / 4
+_K_CON = PI * 1000 / 4
+_K_BUOY = PI * 1025 / 4
+_K_SUB = PI * (7850 - 1025) / 4
+_G_OVER_1000 = 9.8 / 1000.0
+_KLAY = 2.0
+
+# --- RESISTANCE PROFILE LOOKUPS ---
+# Rows are laid out surface-major: 2 surfaces x 3 estimates. Per-estimate
+# constants are expanded to the 6 rows once at import.
+SURFACES = ["Concrete", "PET"]
+ESTIMATES = ["P5", "P50", "P95"]
+_EST_IDX = np.tile(np.arange(len(ESTIMATES)), len(SURFACES))
+# Estimate label column as a fixed-width unicode array (not object), shared read-only
+_EST_ARR = np.array(ESTIMATES, dtype=np.str_)
+_EST_ARR.setflags(write=False)
+
+# Safety factors applied to Lateral Residual (P5 / P50 / P95)
+_LRES_MULT = np.array([1 / 1.5, 1.0, 1.5])[_EST_IDX]
+
+# Axial displacements: min(thr, coef * Dop_mm) for P5/P50, max(...) for P95
+_PIECEWISE = {
+    "xb_thr": np.array([1.25, 5.0, 50.0])[_EST_IDX],
+    "xb_coef": np.array([0.0025, 0.01, 0.01])[_EST_IDX],
+    "xr_thr": np.array([7.5, 30.0, 250.0])[_EST_IDX],
+    "xr_coef": np.array([0.015, 0.06, 0.5])[_EST_IDX],
+    "use_max": np.array([False, False, True])[_EST_IDX],
+    # Lateral displacements: (a + b * Z/Dop) * Dop_mm and c * Dop_mm
+    "yb_a": np.array([0.004, 0.02, 0.1])[_EST_IDX],
+    "yb_b": np.array([0.02, 0.25, 0.7])[_EST_IDX],
+    "yr_c": np.array([0.6, 1.5, 2.8])[_EST_IDX],
+}
+
+
+def _calc_intermediates_py(Dop, tp, Z, Su, Sub_wt, Su_passive, rate):
     """
-    Performs Undrained Pipe-Soil Interaction analysis.
-    Calculates Axial and Lateral resistance profiles for given soil and pipe parameters.
+    Scalar weight, vertical capacity and wedging calculations.
+    Returns (Wp, Wpf, V, Abm, Qv, zeta, Fl_remain).
     """
-    # --- 1. EXTRACT INPUTS ---
-    Dop = inputs['Dop']
-    tp = inputs['tp']
-    Z = inputs['Z']
-    Su = inputs['Su']
-    OCR = inputs['OCR']
-    St = inputs['St']
-    alpha = inputs['alpha']
-    rate = inputs['rate']
-    
-    # Soil Weight correction (Bulk - 10.05 for Submerged)
-    Sub_wt = inputs['gamma_bulk'] - 10.05 
-    Su_passive = inputs['Su_passive'] 
-
     # --- 2. WEIGHT CALCULATIONS ---
     Dip = Dop - 2 * tp
-    g = 9.8
-    Klay = 2.0
+    Dop2 = Dop * Dop
+    Dip2 = Dip * Dip
     
-    # Constants: 7850 (Steel), 1000 (Fluid), 1025 (Seawater)
-    Wp = (np.pi * (Dop**2 - Dip**2) * 7850) / 4
-    Wcon = (np.pi * Dip**2 * 1000) / 4
-    Wb = (np.pi * Dop**2 * 1025) / 4
+    Wp = _K_STEEL * (Dop2 - Dip2)
+    Wcon = _K_CON * Dip2
+    Wb = _K_BUOY * Dop2
     
-    Wpf = ((Wp + Wcon - Wb) * g) / 1000.0
-    Wpins = (np.pi * (Dop**2 - Dip**2) * (7850 - 1025)) / 4
+    Wpf = (Wp + Wcon - Wb) * _G_OVER_1000
+    Wpins = _K_SUB * (Dop2 - Dip2)
     
     # Effective Vertical Force V
-    V = max((Wpins * Klay * g / 1000.0), Wpf)
+    V = max(Wpins * _KLAY * _G_OVER_1000, Wpf)
 
     # --- 3. GEOMETRY & VERTICAL RESISTANCE (Qv) ---
     # Logic for Penetrated Area (Abm)
     if Z < Dop / 2:
-        val = Dop * Z - Z**2
-        B = 2 * np.sqrt(val) if val > 0 else 0
+        val = Dop * Z - Z * Z
+        B = 2 * np.sqrt(val) if val > 0 else 0.0
         if Dop > 0:
-            asin_val = np.arcsin(B / Dop) if abs(B/Dop) <= 1 else 0
-            Abm = (asin_val * (Dop**2 / 4)) - (B * (Dop / 4) * np.cos(asin_val))
+            # cos(asin(x)) = sqrt(1 - x^2), saves a cos call
+            x = B / Dop
+            if abs(x) <= 1:
+                asin_val = np.arcsin(x)
+                cos_asin = np.sqrt(max(0.0, 1.0 - x * x))
+            else:
+                asin_val = 0.0
+                cos_asin = 1.0
+            Abm = (asin_val * (Dop2 / 4)) - (B * (Dop / 4) * cos_asin)
         else:
-            Abm = 0
+            Abm = 0.0
     else:
         B = Dop
-        Abm = (np.pi * Dop**2 / 8) + Dop * (Z - Dop / 2)
+        Abm = (PI * Dop2 / 8) + Dop * (Z - Dop / 2)
         
     # Vertical Bearing Capacity Qv
     if Dop > 0:
@@ -55,20 +87,142 @@ def run_psi_analysis(inputs):
         term2 = 3.4 * (10 * Z / Dop)**0.5
         Qv = (min(term1, term2) + (1.5 * Sub_wt * Abm / (Dop * Su))) * Dop * Su
     else:
-        Qv = 0
+        Qv = 0.0
 
     # --- 4. WEDGING & LATERAL RESISTANCE ---
     # Wedging Factor (zeta)
     cosVal = 1 - Z / (Dop / 2)
     cosVal = max(-1.0, min(1.0, cosVal)) # Safety clamp
     beta = np.arccos(cosVal)
+    # cos(beta) is cosVal and sin(beta) = sqrt(1 - cosVal^2) for beta in [0, pi]
+    sinVal = np.sqrt(max(0.0, 1.0 - cosVal * cosVal))
     
-    denom = beta + np.sin(beta) * np.cos(beta)
-    zeta = (2 * np.sin(beta)) / denom if denom != 0 else 1.0
+    denom = beta + sinVal * cosVal
+    zeta = (2 * sinVal) / denom if denom != 0 else 1.0
     
     # Lateral Remaining Resistance (Passive Soil)
     Fl_remain = Z * rate * (2 * Su_passive + 0.5 * Sub_wt * Z)
 
+    return Wp, Wpf, V, Abm, Qv, zeta, Fl_remain
+
+
+def kernel_fingerprint():
+    """
+    Hash of this module's source, baked into the AOT build so a stale
+    psi_kernels extension is detected and not used. pycc freezes the module
+    constants (PI, _K_*, _G_OVER_1000, _KLAY) into the build, so hashing the
+    kernel text alone would miss edits to them.
+    """
+    with open(__file__, "rb") as f:
+        src = f.read()
+    return int(hashlib.sha256(src).hexdigest()[:15], 16)
+
+
+try:
+    # Native extension built ahead of time by psi_kernels_build.py (no JIT stall),
+    # only used if it was built from the current module source
+    import psi_kernels
+    if psi_kernels.kernel_fingerprint() != kernel_fingerprint():
+        raise ImportError("psi_kernels is out of date, rebuild with psi_kernels_build.py")
+    _calc_intermediates = psi_kernels.calc_inter
+except (ImportError, AttributeError):
+    # numba is only imported here, so loading the prebuilt extension stays cheap
+    try:
+        from numba import njit
+    except ImportError:  # numba is optional, fall back to plain Python
+        def njit(*args, **kwargs):
+            return lambda func: func
+    _calc_intermediates = njit(cache=True)(_calc_intermediates_py)
+
+
+def calculate_intermediates_batch(Dop, tp, Z, Su, Sub_wt, Su_passive, rate):
+    """
+    Array version of _calc_intermediates for parametric sweeps (e.g. V vs Z).
+    Inputs are broadcast against each other; returns a dict of float arrays
+    of the broadcast shape (at least 1-d, so scalar inputs give shape (1,)).
+    Kept in step with the scalar kernel by psi_consistency_check.py.
+    """
+    Dop, tp, Z, Su, Sub_wt, Su_passive, rate = np.broadcast_arrays(
+        *(np.asarray(x, dtype=float) for x in (Dop, tp, Z, Su, Sub_wt, Su_passive, rate))
+    )
+    
+    # Branches are evaluated on every element and then selected, so silence
+    # warnings coming from the branch that is discarded
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # --- 2. WEIGHT CALCULATIONS ---
+        Dip = Dop - 2 * tp
+        Dop2 = Dop * Dop
+        Dip2 = Dip * Dip
+        
+        Wp = _K_STEEL * (Dop2 - Dip2)
+        Wcon = _K_CON * Dip2
+        Wb = _K_BUOY * Dop2
+        
+        Wpf = (Wp + Wcon - Wb) * _G_OVER_1000
+        Wpins = _K_SUB * (Dop2 - Dip2)
+        
+        V = np.maximum(Wpins * _KLAY * _G_OVER_1000, Wpf)
+        
+        # --- 3. GEOMETRY & VERTICAL RESISTANCE (Qv) ---
+        B = 2 * np.sqrt(np.maximum(Dop * Z - Z * Z, 0.0))
+        ratio = B / Dop
+        in_domain = np.abs(ratio) <= 1
+        asin_val = np.where(in_domain, np.arcsin(np.clip(ratio, -1.0, 1.0)), 0.0)
+        cos_asin = np.where(in_domain, np.sqrt(np.maximum(0.0, 1.0 - ratio * ratio)), 1.0)
+        Abm_shallow = np.where(
+            Dop > 0, (asin_val * (Dop2 / 4)) - (B * (Dop / 4) * cos_asin), 0.0
+        )
+        Abm_deep = (PI * Dop2 / 8) + Dop * (Z - Dop / 2)
+        Abm = np.where(Z < Dop / 2, Abm_shallow, Abm_deep)
+        
+        term1 = 6 * (Z / Dop)**0.25
+        term2 = 3.4 * (10 * Z / Dop)**0.5
+        Qv = np.where(
+            Dop > 0, (np.minimum(term1, term2) + (1.5 * Sub_wt * Abm / (Dop * Su))) * Dop * Su, 0.0
+        )
+        
+        # --- 4. WEDGING & LATERAL RESISTANCE ---
+        cosVal = np.clip(1 - Z / (Dop / 2), -1.0, 1.0)
+        beta = np.arccos(cosVal)
+        sinVal = np.sqrt(np.maximum(0.0, 1.0 - cosVal * cosVal))
+        
+        denom = beta + sinVal * cosVal
+        zeta = np.where(denom != 0, (2 * sinVal) / denom, 1.0)
+        
+        Fl_remain = Z * rate * (2 * Su_passive + 0.5 * Sub_wt * Z)
+    
+    # np.where gives 0-d arrays and plain ops give np.float64 for scalar
+    # inputs, so normalise every output to the same array type
+    out = {
+        "Wp": Wp, "Wpf": Wpf, "V": V,
+        "Abm": Abm, "Qv": Qv, "zeta": zeta,
+        "Fl_remain": Fl_remain,
+    }
+    return {key: np.atleast_1d(val) for key, val in out.items()}
+
+
+def run_psi_analysis(inputs):
+    """
+    Performs Undrained Pipe-Soil Interaction analysis.
+    Calculates Axial and Lateral resistance profiles for given soil and pipe parameters.
+    """
+    # --- 1. EXTRACT INPUTS ---
+    Dop = inputs['Dop']
+    tp = inputs['tp']
+    Z = inputs['Z']
+    Su = inputs['Su']
+    OCR = inputs['OCR']
+    St = inputs['St']
+    alpha = inputs['alpha']
+    rate = inputs['rate']
+    
+    # Soil Weight correction (Bulk - 10.05 for Submerged)
+    Sub_wt = inputs['gamma_bulk'] - 10.05 
+    Su_passive = inputs['Su_passive'] 
+
+    # --- 2-4. WEIGHTS, VERTICAL CAPACITY & WEDGING ---
+    Wp, Wpf, V, Abm, Qv, zeta, Fl_remain = _calc_intermediates(Dop, tp, Z, Su, Sub_wt, Su_passive, rate)
+
     # --- 5. PREPARE RESULTS ---
     results = {
         "metrics": {
@@ -76,67 +230,51 @@ def run_psi_analysis(inputs):
             "Abm": Abm, "Qv": Qv, "zeta": zeta, 
             "Fl_remain": Fl_remain, "Check_V_Qv": (V < Qv)
         },
-        "profiles": []
+        "surfaces": {}
     }
 
     # --- 6. CALCULATE RESISTANCE PROFILES ---
-    surfaces = ["Concrete", "PET"]
-    estimates = ["P5", "P50", "P95"]
-    
-    for surf_name in surfaces:
-        for est in estimates:
-            # Retrieve SSR/Prem inputs dynamically
-            key_ssr = f"{surf_name}_{est}_SSR"
-            key_prem = f"{surf_name}_{est}_Prem"
-            
-            SSR = inputs[key_ssr]
-            Prem = inputs[key_prem]
-            
-            # Axial Breakout
-            Abrk = alpha * SSR * (OCR**Prem) * zeta * rate * V
-            
-            # Axial Residual
-            Ares = (1.0 / St) * Abrk
-            
-            # Lateral Breakout (Friction + Passive)
-            Lbrk = (alpha * SSR * (OCR**Prem) * rate * V) + Fl_remain
-            
-            # Lateral Residual
-            Lres_raw = (0.32 + 0.8 * (Z / Dop)**0.8) * V if Dop > 0 else 0
-            
-            # Apply safety factors to Residual
-            if est == "P5":
-                Lres = Lres_raw / 1.5
-            elif est == "P95":
-                Lres = Lres_raw * 1.5
-            else:
-                Lres = Lres_raw
-                
-            # Displacements Calculation
-            Dop_mm = Dop * 1000.0
-            
-            if est == "P5":
-                Xb = min(1.25, 0.0025 * Dop_mm)
-                Xr = min(7.5, 0.015 * Dop_mm)
-                Yb = (0.004 + 0.02 * (Z/Dop)) * Dop_mm
-                Yr = 0.6 * Dop_mm
-            elif est == "P50":
-                Xb = min(5.0, 0.01 * Dop_mm)
-                Xr = min(30.0, 0.06 * Dop_mm)
-                Yb = (0.02 + 0.25 * (Z/Dop)) * Dop_mm
-                Yr = 1.5 * Dop_mm
-            else: # P95
-                Xb = max(50.0, 0.01 * Dop_mm)
-                Xr = max(250.0, 0.5 * Dop_mm)
-                Yb = (0.1 + 0.7 * (Z/Dop)) * Dop_mm
-                Yr = 2.8 * Dop_mm
-                
-            # Append to results list
-            results["profiles"].append({
-                "Surface": surf_name,
-                "Estimate": est,
-                "Axial": {"BreakForce": Abrk, "BreakDisp": Xb, "ResForce": Ares, "ResDisp": Xr},
-                "Lateral": {"BreakForce": Lbrk, "BreakDisp": Yb, "ResForce": Lres, "ResDisp": Yr}
-            })
+    # All 6 rows (2 surfaces x 3 estimates) are evaluated at once as arrays
+    # Surface coefficients are ((SSR P5, P50, P95), (Prem P5, P50, P95))
+    coeffs = np.array([inputs[s] for s in SURFACES], dtype=np.float64)
+    SSR = coeffs[:, 0].ravel()
+    Prem = coeffs[:, 1].ravel()
+    
+    friction = alpha * SSR * (OCR**Prem) * rate * V
+    
+    # Axial Breakout
+    Abrk = friction * zeta
+    
+    # Axial Residual
+    Ares = (1.0 / St) * Abrk
+    
+    # Lateral Breakout (Friction + Passive)
+    Lbrk = friction + Fl_remain
+    
+    # Lateral Residual, with safety factors applied for P5/P95
+    Lres_raw = (0.32 + 0.8 * (Z / Dop)**0.8) * V if Dop > 0 else 0
+    Lres = Lres_raw * _LRES_MULT
+    
+    # Displacements Calculation
+    Dop_mm = Dop * 1000.0
+    pw = _PIECEWISE
+    
+    Xb_raw = pw["xb_coef"] * Dop_mm
+    Xb = np.where(pw["use_max"], np.maximum(pw["xb_thr"], Xb_raw), np.minimum(pw["xb_thr"], Xb_raw))
+    Xr_raw = pw["xr_coef"] * Dop_mm
+    Xr = np.where(pw["use_max"], np.maximum(pw["xr_thr"], Xr_raw), np.minimum(pw["xr_thr"], Xr_raw))
+    Yb = (pw["yb_a"] + pw["yb_b"] * (Z/Dop)) * Dop_mm
+    Yr = pw["yr_c"] * Dop_mm
+    
+    # Store profiles column-wise per surface. Rows are surface-major, so each
+    # surface is a contiguous slice and callers never need to filter
+    n_est = len(ESTIMATES)
+    for i, surf_name in enumerate(SURFACES):
+        rows = slice(i * n_est, (i + 1) * n_est)
+        results["surfaces"][surf_name] = {
+            "estimate": _EST_ARR,
+            "ax_brkF": Abrk[rows], "ax_brkD": Xb[rows], "ax_resF": Ares[rows], "ax_resD": Xr[rows],
+            "lat_brkF": Lbrk[rows], "lat_brkD": Yb[rows], "lat_resF": Lres[rows], "lat_resD": Yr[rows],
+        }
             
     return results
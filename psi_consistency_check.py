@@ -0,0 +1,61 @@
+"""
+Consistency check between the scalar and batch PSI intermediates.
+Run `python psi_consistency_check.py`; exits non-zero if calculate_intermediates_batch
+disagrees with _calc_intermediates_py or the active (_calc_intermediates) kernel.
+"""
+import sys
+
+import numpy as np
+
+import psi_backend as backend
+
+KEYS = ("Wp", "Wpf", "V", "Abm", "Qv", "zeta", "Fl_remain")
+RTOL = 1e-10
+ATOL = 1e-12
+
+
+def random_cases(n, seed=0):
+    rng = np.random.default_rng(seed)
+    Dop = rng.uniform(0.1, 1.5, n)
+    tp = Dop * rng.uniform(0.01, 0.1, n)
+    # Z spans both the shallow (Z < Dop/2) and deep Abm branches
+    Z = Dop * rng.uniform(0.0, 1.2, n)
+    Su = rng.uniform(1.0, 50.0, n)
+    Sub_wt = rng.uniform(2.0, 10.0, n)
+    Su_passive = rng.uniform(1.0, 50.0, n)
+    rate = rng.uniform(0.5, 2.0, n)
+    return Dop, tp, Z, Su, Sub_wt, Su_passive, rate
+
+
+def main():
+    cases = random_cases(500)
+    batch = backend.calculate_intermediates_batch(*cases)
+    failures = []
+
+    for key in KEYS:
+        if not (isinstance(batch[key], np.ndarray) and batch[key].shape == cases[0].shape):
+            failures.append(f"batch[{key!r}] is not an array of shape {cases[0].shape}")
+
+    scalar = backend.calculate_intermediates_batch(*(c[0] for c in cases))
+    for key in KEYS:
+        if not (isinstance(scalar[key], np.ndarray) and scalar[key].shape == (1,)):
+            failures.append(f"scalar batch[{key!r}] is not an array of shape (1,)")
+
+    for name, kernel in (("_calc_intermediates_py", backend._calc_intermediates_py),
+                         ("_calc_intermediates", backend._calc_intermediates)):
+        ref = np.array([kernel(*(float(c[i]) for c in cases)) for i in range(len(cases[0]))])
+        for j, key in enumerate(KEYS):
+            if not np.allclose(batch[key], ref[:, j], rtol=RTOL, atol=ATOL):
+                worst = np.max(np.abs(batch[key] - ref[:, j]))
+                failures.append(f"{key}: batch vs {name} differ (max abs diff {worst:.3e})")
+
+    for msg in failures:
+        print("FAIL:", msg)
+    if failures:
+        return 1
+    print(f"OK: batch and scalar intermediates agree on {len(cases[0])} cases")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,27 @@
+"""
+Ahead-of-time build of the PSI numba kernels.
+Run `python psi_kernels_build.py` to produce the psi_kernels extension
+next to psi_backend.py; the backend falls back to @njit if it is missing
+or was built from an older version of the kernel.
+"""
+import os
+
+from numba.pycc import CC
+
+import psi_backend
+
+cc = CC("psi_kernels")
+cc.output_dir = os.path.dirname(os.path.abspath(__file__))
+
+# (Dop, tp, Z, Su, Sub_wt, Su_passive, rate) -> (Wp, Wpf, V, Abm, Qv, zeta, Fl_remain)
+cc.export("calc_inter", "UniTuple(f8, 7)(f8, f8, f8, f8, f8, f8, f8)")(psi_backend._calc_intermediates_py)
+
+# Source fingerprint checked by psi_backend before using the extension
+_FINGERPRINT = psi_backend.kernel_fingerprint()
+
+@cc.export("kernel_fingerprint", "i8()")
+def kernel_fingerprint():
+    return _FINGERPRINT
+
+if __name__ == "__main__":
+    cc.compile()